@@ -20,37 +20,35 @@ temps['cntry_code'] = temps['cntry_code'].astype(str).str.strip().str.upper()
 
 # ---- 3) Termékáras fájl beolvasása ----
 # Ez lehet vessző- vagy pontosvessző-szeparált is, és decimális vesszőt használhat.
-# A sep=None + engine='python' általában jól auto-detekál.
-prices = pd.read_csv(PRICE_CSV, sep=None, engine='python')
+# A szeparátort a fejlécsorból döntjük el, így a gyors (többszálú) pyarrow olvasó használható
+# a lassú sep=None + engine='python' sniffer helyett.
+with open(PRICE_CSV, encoding='utf-8') as f:
+    header = f.readline()
+sep = ';' if header.count(';') > header.count(',') else ','
+prices = pd.read_csv(PRICE_CSV, sep=sep, engine='pyarrow', dtype_backend='pyarrow')
 
 # Kulcsmezők rendbetétele
 prices['year'] = prices['year'].astype(int)
 prices['geo']  = prices['geo'].astype(str).str.strip().str.upper()
 
 # Ha a price_eur_tonne decimális VESSZŐS (pl. "4 733,9" vagy "4733,9"),
-# alakítsuk át float-tá. Ha már float, ez nem fog ártani.
-if prices['price_eur_tonne'].dtype == object:
+# alakítsuk át float-tá. Ha már szám típusú, nem nyúlunk hozzá.
+if not pd.api.types.is_numeric_dtype(prices['price_eur_tonne']):
     prices['price_eur_tonne'] = (
         prices['price_eur_tonne']
         .astype(str)
-        .str.replace('\u00A0', '', regex=False)  # nem törő szóköz
-        .str.replace(' ', '', regex=False)       # ezreselválasztó
-        .str.replace('.', '', regex=False)       # néha pontot használnak ezreselválasztónak
+        # egy menetben: nem törő szóköz, szóköz és pont (ezreselválasztók) törlése
+        .str.replace(r'[\u00A0 .]', '', regex=True)
         .str.replace(',', '.', regex=False)      # decimális vessző -> pont
     )
     # ami konvertálható, az float lesz; ami nem, az NaN
     prices['price_eur_tonne'] = pd.to_numeric(prices['price_eur_tonne'], errors='coerce')
 
-# ---- 4) Merge year+geo (→ cntry_code) alapon ----
-merged = prices.merge(
-    temps[['year', 'cntry_code', 'avg_temp_c']],
-    left_on=['year', 'geo'],
-    right_on=['year', 'cntry_code'],
-    how='left',
-)
-
-# Nem kell kétszer a kód: a cntry_code helper oszlopot el lehet dobni, ha zavar
-merged = merged.drop(columns=['cntry_code'])
+# ---- 4) Join year+geo (→ cntry_code) alapon ----
+# A hőmérséklet-tábla indexe lesz a kulcs, így nem kell helper oszlopot eldobni;
+# a validate='m:1' hibát dob, ha egy (year, cntry_code) pár többször szerepelne.
+temps_idx = temps.set_index(['year', 'cntry_code'])['avg_temp_c']
+merged = prices.join(temps_idx, on=['year', 'geo'], how='left', validate='m:1')
 
 # ---- 5) Gyors ellenőrzések ----
 # a) Van-e olyan sor, ahol nem talált hőmérséklet?
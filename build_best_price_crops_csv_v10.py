@@ -6,18 +6,27 @@
 
 import sys
 import re
-from typing import List, Optional, Iterable
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, List, Optional, Iterable
+import numpy as np
 import pandas as pd
 
 try:
     import eurostat
 except Exception as e:
-    sys.exit("Please install dependencies first:\n  pip install eurostat pandas\n" + str(e))
+    sys.exit("Please install dependencies first:\n  pip install eurostat pandas numpy\n" + str(e))
 
 DATASET = "apri_ap_crpouta"
 
+# Local parquet copies of the Eurostat payloads; refreshed when older than a day.
+CACHE_DIR = Path(".cache")
+CACHE_MAX_AGE_S = 24 * 3600
+
 EU_LIKE_PREFIXES = {"AT","BE","BG","HR","CY","CZ","DK","EE","FI","FR","DE","EL","GR","HU","IE","IT","LV","LT","LU","MT","NL","PL","PT","RO","SK","SI","ES","SE"}
 OTHER_EUROPE = {"NO","IS","CH","UK"}
+YEAR_MIN, YEAR_MAX = 2000, 2024
 
 CATEGORIES = [
     ("arable",     "Arable (cereals/oilseeds)"),
@@ -44,44 +53,51 @@ KEYWORDS = {
     "industrial": [r"tobacco", r"hops?", r"flax", r"hemp", r"cotton", r"aromatic|medicinal|spice|industrial"],
 }
 
-def classify_product(label: str) -> Optional[str]:
-    if not label:
-        return None
-    text = label.lower()
-    for cat in ["arable","rowCrops","vegetables","orchards","forage","industrial"]:
-        for pat in KEYWORDS.get(cat, []):
-            if re.search(pat, text):
-                return cat
-    return None
-
-def parse_mass_multiplier(label: str) -> Optional[float]:
-    t = (label or "").lower()
-    if "per tonne" in t or "per ton" in t:
-        return 1.0
-    m = re.search(r"per\s*([0-9]+)\s*kg", t)
-    if m:
-        n = int(m.group(1))
-        if n > 0:
-            return 1000.0 / n
-    if "per kg" in t:
-        return 1000.0
-    if any(x in t for x in ["per 100 l", "per hl", "per 100 pce", "per pce", "per 1000 pce", "per litre", "per 100 l"]):
-        return None
+# Single regex over all categories: one anchored lookahead + empty named group per category,
+# tried in CATEGORIES order, so the first category with any keyword hit wins (not the leftmost hit).
+CATEGORY_REGEX = re.compile(
+    "^(?:" + "|".join(
+        f"(?=.*?(?:{'|'.join(KEYWORDS[cat])}))(?P<{cat}>)" for cat, _ in CATEGORIES
+    ) + ")",
+    re.IGNORECASE | re.DOTALL,
+)
+
+def classify_products(labels: pd.Series) -> pd.Series:
+    # keep only the per-category named groups; keyword patterns add their own numbered groups
+    hits = labels.str.extract(CATEGORY_REGEX, expand=True)[[cat for cat, _ in CATEGORIES]].notna()
+    return hits.idxmax(axis=1).where(hits.any(axis=1))
+
+def mass_multipliers(labels: pd.Series) -> pd.Series:
+    """EUR/unit -> EUR/tonne factor per label; NaN for non-mass units (hl, pce, litre, ...)."""
+    lbl = labels.str.lower()
+    kg = pd.to_numeric(lbl.str.extract(r"per\s*([0-9]+)\s*kg", expand=False), errors="coerce")
+    mult = np.select(
+        [
+            lbl.str.contains("per ton", regex=False, na=False),
+            kg > 0,
+            lbl.str.contains("per kg", regex=False, na=False),
+        ],
+        [1.0, 1000.0 / kg, 1000.0],
+        default=np.nan,
+    )
+    return pd.Series(mult, index=labels.index)
+
+def column_year(c) -> Optional[int]:
+    if isinstance(c, (int, float)) and float(c).is_integer() and 1900 <= int(c) <= 2100:
+        return int(c)
+    if isinstance(c, str) and c.isdigit() and 1900 <= int(c) <= 2100:
+        return int(c)
     return None
 
 def wide_to_long(df_raw: pd.DataFrame) -> pd.DataFrame:
-    header = df_raw.iloc[0].tolist()
-    data = df_raw.iloc[1:].copy()
-    data.columns = header
+    data = df_raw.iloc[1:]
+    data.columns = df_raw.iloc[0].tolist()
     if "geo\\TIME_PERIOD" in data.columns:
-        data.rename(columns={"geo\\TIME_PERIOD":"geo"}, inplace=True)
-    year_cols: List[str] = []
-    for c in data.columns:
-        if isinstance(c, (int, float)) and float(c).is_integer() and 1900 <= int(c) <= 2100:
-            year_cols.append(c)
-        elif isinstance(c, str) and c.isdigit() and 1900 <= int(c) <= 2100:
-            year_cols.append(c)
-    id_cols = [c for c in data.columns if c not in year_cols]
+        data = data.rename(columns={"geo\\TIME_PERIOD":"geo"})
+    years = {c: column_year(c) for c in data.columns}
+    id_cols = [c for c, y in years.items() if y is None]
+    # only melt the years we export; drops most of the long frame before it is allocated
+    year_cols = [c for c, y in years.items() if y is not None and YEAR_MIN <= y <= YEAR_MAX]
     long = data.melt(id_vars=id_cols, value_vars=year_cols, var_name="year", value_name="price")
     long["year"] = long["year"].astype(int)
     return long
@@ -98,12 +114,33 @@ def try_get_dic(dataset: str, candidates):
             continue
     return None
 
-def main():
+def cached_frame(name: str, build: Callable[[], Optional[pd.DataFrame]]) -> Optional[pd.DataFrame]:
+    path = CACHE_DIR / f"{name}.parquet"
+    if path.exists() and time.time() - path.stat().st_mtime < CACHE_MAX_AGE_S:
+        return pd.read_parquet(path)
+    df = build()
+    if df is not None:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(path, index=False)
+    return df
+
+def fetch_long() -> pd.DataFrame:
     raw = eurostat.get_data(DATASET)
     df_raw = pd.DataFrame(raw)
     if df_raw.empty:
         sys.exit("Eurostat returned empty dataset.")
-    df = wide_to_long(df_raw)
+    long = wide_to_long(df_raw)
+    # ':' placeholders become NaN here so the column has one type for parquet
+    long["price"] = pd.to_numeric(long["price"], errors="coerce")
+    return long
+
+@lru_cache(maxsize=None)
+def dim_codes() -> List[str]:
+    pars = eurostat.get_pars(DATASET)
+    return [p[0] for p in pars] if pars else []
+
+def main():
+    df = cached_frame(f"eurostat_{DATASET}_long", fetch_long)
 
     colmap = {c.lower(): c for c in df.columns}
     def ensure_col(name: str, cands):
@@ -118,21 +155,23 @@ def main():
     ensure_col("currency", ["currency","c","curr"])
     ensure_col("geo", ["geo","g"])
 
-    df = df[df["currency"] == "EUR"].copy()
-    df = df[df["geo"].apply(lambda g: isinstance(g,str) and (g[:2] in EU_LIKE_PREFIXES or g in OTHER_EUROPE))]
-    df = df[(df["year"] >= 2000) & (df["year"] <= 2024)].copy()
-
-    df = df[df["price"].notna() & (df["price"] != ":")].copy()
-    df["price"] = pd.to_numeric(df["price"], errors="coerce")
-    df = df.dropna(subset=["price"])
-
-    pars = eurostat.get_pars(DATASET)
-    dim_codes = [p[0] for p in pars] if pars else []
-    prod_candidates = ["prod","p","prod_veg"] + dim_codes
-    geo_candidates  = ["geo","g"] + dim_codes
-
-    prod_dic = try_get_dic(DATASET, prod_candidates)
-    geo_dic  = try_get_dic(DATASET, geo_candidates)
+    # Filters build masks and slice without .copy(); every slice ends in reset_index(drop=True),
+    # which hands back a fresh frame that the later column assignments can write to.
+    geo = df["geo"].astype("string")
+    price = pd.to_numeric(df["price"], errors="coerce")  # ':' -> NaN
+    keep = (
+        (df["currency"] == "EUR")
+        & (geo.str.slice(0, 2).isin(EU_LIKE_PREFIXES) | geo.isin(OTHER_EUROPE))
+        & df["year"].between(YEAR_MIN, YEAR_MAX)
+        & price.notna()
+    )
+    keep = keep.fillna(False)
+    df = df.assign(price=price)[keep].reset_index(drop=True)
+
+    prod_dic = cached_frame(f"eurostat_{DATASET}_prod_dic",
+                            lambda: try_get_dic(DATASET, ["prod","p","prod_veg"] + dim_codes()))
+    geo_dic  = cached_frame(f"eurostat_{DATASET}_geo_dic",
+                            lambda: try_get_dic(DATASET, ["geo","g"] + dim_codes()))
 
     prod_map = dict(zip(prod_dic.get("val",[]), prod_dic.get("descr",[]))) if prod_dic is not None else {}
     geo_map  = dict(zip(geo_dic.get("val",[]),  geo_dic.get("descr",[]))) if geo_dic is not None else {}
@@ -140,14 +179,17 @@ def main():
     df["prod_label"] = df["prod"].map(prod_map).fillna(df["prod"])
     df["country"]    = df["geo"].map(geo_map).fillna(df["geo"])
 
-    df["mult"] = df["prod_label"].map(parse_mass_multiplier)
-    df = df.dropna(subset=["mult"]).copy()
-    df["price_eur_t"] = df["price"] * df["mult"]
-
-    df["category_key"] = df["prod_label"].map(classify_product)
-    df = df[df["category_key"].notna()].copy()
+    # price is already non-null, so a NaN product means a non-mass unit
+    price_eur_t = df["price"].to_numpy() * mass_multipliers(df["prod_label"]).to_numpy()
+    df = df.assign(price_eur_t=price_eur_t, category_key=classify_products(df["prod_label"]))
+    df = df[~np.isnan(price_eur_t) & df["category_key"].notna().to_numpy()].reset_index(drop=True)
     df["category_label"] = df["category_key"].map(CAT_LABEL)
 
+    # low-cardinality keys -> integer codes for the sorts and dedup below
+    # (categories are built lexically sorted, so ordering is unchanged)
+    for col in ("geo", "prod", "country", "category_key"):
+        df[col] = df[col].astype("category")
+
     full = df[[
         "year","country","geo","category_key","category_label","prod_label","prod","price_eur_t"
     ]].rename(columns={
@@ -156,8 +198,12 @@ def main():
 
     full.to_csv("all_products_prices_6cats_2000_2024.csv", index=False, encoding="utf-8")
 
-    idx = df.groupby(["geo","year","category_key"])["price_eur_t"].idxmax()
-    best = df.loc[idx].sort_values(["year","geo","category_key"])
+    # stable sort keeps the first-seen row on ties, same as idxmax
+    best = (
+        df.sort_values("price_eur_t", ascending=False, kind="mergesort")
+        .drop_duplicates(["geo","year","category_key"], keep="first")
+        .sort_values(["year","geo","category_key"])
+    )
     top = best[[
         "year","country","geo","category_key","category_label","prod_label","prod","price_eur_t"
     ]].rename(columns={
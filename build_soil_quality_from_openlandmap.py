@@ -1,15 +1,17 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import os, io, json, re, zipfile, tempfile, warnings
+import os, io, re, zipfile, tempfile, warnings
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
 import numpy as np
 import pandas as pd
-import requests
 import geopandas as gpd
 import rasterio
 from rasterstats import zonal_stats
 
+from http_session import make_session
+
 # ---- Beállítások ------------------------------------------------------------
 
 BOUNDARY_DIR = "data/boundaries"
@@ -52,6 +54,21 @@ STAC_COLLECTIONS = {
 
 OUTPUT_CSV = "soil_quality_country_openlandmap.csv"
 
+# GDAL beállítások a távoli COG-okhoz: összevont range-kérések + /vsicurl/ blokk-cache,
+# így a validáló megnyitás és a zónastatisztika ugyanazt a cache-t használja.
+GDAL_ENV = {
+    "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES",
+    "VSI_CACHE": "TRUE",
+    "CPL_VSIL_CURL_CACHE_SIZE": 200_000_000,
+    "GDAL_CACHEMAX": 512,
+    "CPL_VSIL_CURL_ALLOWED_EXTENSIONS": ".tif,.tiff,.vrt",
+    "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+}
+
+# ---- Segédek: HTTP ----------------------------------------------------------
+
+SESSION = make_session()
+
 # ---- Segédek: határok -------------------------------------------------------
 
 def ensure_dirs():
@@ -59,21 +76,21 @@ def ensure_dirs():
     os.makedirs("data/rasters", exist_ok=True)
 
 def download(url: str, dest: str):
-    r = requests.get(url, timeout=120)
+    r = SESSION.get(url, timeout=120)
     r.raise_for_status()
     with open(dest, "wb") as f:
         f.write(r.content)
 
 def build_nuts0_from_full(full_geojson_path: str, out_path: str):
-    gdf = gpd.read_file(full_geojson_path)
-    nuts0 = gdf[gdf["LEVL_CODE"] == 0].copy()
+    # a NUTS 1/2/3 szinteket már az OGR olvasó eldobja
+    nuts0 = gpd.read_file(full_geojson_path, engine="pyogrio", where="LEVL_CODE = 0")
     for c in ["CNTR_CODE", "cntr_code", "CNTRCODE", "ISO2", "ISO2_CODE", "CNTR_ID"]:
         if c in nuts0.columns:
             nuts0 = nuts0.rename(columns={c: "CNTR_CODE"})
             break
     if nuts0.crs is None:
         nuts0.set_crs(epsg=4326, inplace=True)
-    else:
+    elif nuts0.crs.to_epsg() != 4326:
         nuts0 = nuts0.to_crs(epsg=4326)
     nuts0[["CNTR_CODE","geometry"]].to_file(out_path, driver="GeoJSON")
 
@@ -112,8 +129,8 @@ def ensure_boundaries(path: str):
     ensure_uk_in_boundaries(path)
 
 def load_nuts0_subset(path: str, targets: List[str]) -> gpd.GeoDataFrame:
-    gdf = gpd.read_file(path)
-    gdf = gdf[gdf["CNTR_CODE"].isin(targets)].copy()
+    codes = ",".join(f"'{c}'" for c in targets)
+    gdf = gpd.read_file(path, engine="pyogrio", where=f"CNTR_CODE IN ({codes})", columns=["CNTR_CODE"])
     return gdf.to_crs(epsg=4326)
 
 # ---- Forrásválasztó: helyi -> fallback COG -> STAC --------------------------
@@ -124,9 +141,14 @@ def first_existing(paths: List[str]) -> Optional[str]:
             return p
     return None
 
+def as_vsicurl(path_or_url: str) -> str:
+    if path_or_url.startswith(("http://", "https://")):
+        return f"/vsicurl/{path_or_url}"
+    return path_or_url
+
 def try_open_as_raster(path_or_url: str) -> bool:
     try:
-        with rasterio.open(path_or_url) as src:
+        with rasterio.open(as_vsicurl(path_or_url)) as src:
             _ = src.count
         return True
     except Exception:
@@ -144,9 +166,17 @@ def pick_from_local(layer_key: str) -> Optional[str]:
         return p
     return None
 
+def safe_get_json(url: str) -> Optional[dict]:
+    try:
+        r = SESSION.get(url, timeout=120)
+        r.raise_for_status()
+        return r.json()
+    except Exception:
+        return None
+
 def pick_from_stac(collection_url: str, prefer_depth_patterns: List[str]) -> Optional[str]:
     try:
-        r = requests.get(collection_url, timeout=120)
+        r = SESSION.get(collection_url, timeout=120)
         r.raise_for_status()
         coll = r.json()
     except Exception:
@@ -161,22 +191,21 @@ def pick_from_stac(collection_url: str, prefer_depth_patterns: List[str]) -> Opt
             candidates.append((title, href))
 
     if not candidates:
-        for l in coll.get("links", []):
-            if l.get("rel") not in ("item","items"): 
-                continue
-            href = l.get("href")
-            if not href: 
-                continue
-            try:
-                r2 = requests.get(href, timeout=120); r2.raise_for_status()
-                item = r2.json()
-                for k, a in (item.get("assets") or {}).items():
-                    ahref = a.get("href","")
-                    atitle = (a.get("title") or k or "").lower()
-                    if ahref.lower().endswith((".tif",".tiff",".vrt")):
-                        candidates.append((atitle, ahref))
-            except Exception:
+        item_hrefs = [
+            l.get("href") for l in coll.get("links", [])
+            if l.get("rel") in ("item","items") and l.get("href")
+        ]
+        # az item JSON-ok független GET-ek: párhuzamosan kérjük le őket (sorrend megmarad)
+        with ThreadPoolExecutor(max_workers=16) as ex:
+            items = list(ex.map(safe_get_json, item_hrefs))
+        for item in items:
+            if not item:
                 continue
+            for k, a in (item.get("assets") or {}).items():
+                ahref = a.get("href","")
+                atitle = (a.get("title") or k or "").lower()
+                if ahref.lower().endswith((".tif",".tiff",".vrt")):
+                    candidates.append((atitle, ahref))
 
     if not candidates:
         return None
@@ -193,6 +222,9 @@ def pick_from_stac(collection_url: str, prefer_depth_patterns: List[str]) -> Opt
     return None
 
 def select_raster(layer_key: str) -> str:
+    return as_vsicurl(_select_raster(layer_key))
+
+def _select_raster(layer_key: str) -> str:
     # 1) helyi
     p = pick_from_local(layer_key)
     if p: 
@@ -216,23 +248,36 @@ def select_raster(layer_key: str) -> str:
 # ---- Zónastatisztika --------------------------------------------------------
 
 def zonal_mean_for_raster(path_or_url: str, nuts0: gpd.GeoDataFrame, nodata: Optional[float]=None) -> pd.DataFrame:
-    # rasterio megnyitás csak validálásra kell; a rasterstats közvetlenül a path_or_url-t is eszi
+    # rasterio megnyitás validálásra + nodata és CRS kiolvasására; a rasterstats közvetlenül a path_or_url-t eszi
     try:
         with rasterio.open(path_or_url) as src:
             nodata_val = nodata if nodata is not None else src.nodata
+            raster_crs = src.crs
     except Exception as e:
         raise RuntimeError(f"Nem tudom megnyitni a rasztert: {path_or_url}\n{e}")
 
-    records = []
-    for _, row in nuts0.iterrows():
-        geom = json.loads(gpd.GeoSeries([row.geometry]).to_json())["features"][0]["geometry"]
-        zs = zonal_stats([geom], path_or_url, stats="mean", nodata=nodata_val, all_touched=False)
-        records.append({"CNTR_CODE": row["CNTR_CODE"], "mean": zs[0].get("mean")})
-    return pd.DataFrame.from_records(records)
+    # a poligonokat egyszer vetítjük a raszter saját CRS-ébe (a rasterstats maga nem vetít)
+    nuts_local = nuts0.to_crs(raster_crs) if raster_crs and nuts0.crs != raster_crs else nuts0
+
+    # egyetlen hívás az összes országra: egyszer nyílik meg a raszter; az eredmény sorrendje = nuts0 sorrendje
+    zs = zonal_stats(list(nuts_local.geometry), path_or_url, stats="mean", nodata=nodata_val, all_touched=False)
+    return pd.DataFrame({
+        "CNTR_CODE": nuts0["CNTR_CODE"].values,
+        "mean": [z.get("mean") for z in zs],
+    })
+
+def zonal_mean_in_env(path_or_url: str, nuts0: gpd.GeoDataFrame) -> pd.DataFrame:
+    # a rasterio.Env szálankénti, ezért a worker szálban újra be kell állítani
+    with rasterio.Env(**GDAL_ENV):
+        return zonal_mean_for_raster(path_or_url, nuts0)
 
 # ---- Fő ---------------------------------------------------------------------
 
 def main():
+    with rasterio.Env(**GDAL_ENV):
+        run()
+
+def run():
     warnings.filterwarnings("ignore")
     ensure_boundaries(BOUNDARY_PATH)
     nuts0 = load_nuts0_subset(BOUNDARY_PATH, TARGET_CNTR)
@@ -242,8 +287,11 @@ def main():
     ph_src  = select_raster("ph_h2o")
     soc_src = select_raster("soc_gkg")
 
-    df_ph  = zonal_mean_for_raster(ph_src, nuts0)
-    df_soc = zonal_mean_for_raster(soc_src, nuts0)
+    # a két réteg független: párhuzamosan futnak (a GDAL IO alatt elengedi a GIL-t)
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        f_ph  = ex.submit(zonal_mean_in_env, ph_src, nuts0)
+        f_soc = ex.submit(zonal_mean_in_env, soc_src, nuts0)
+        df_ph, df_soc = f_ph.result(), f_soc.result()
 
     # SOC már g/kg egységű fallback COG-oknál. Ha olyan forrást adsz meg, ami "x5 g/kg",
     # akkor itt szorozd meg 5-tel (pl. df_soc['mean'] *= 5.0).
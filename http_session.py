@@ -0,0 +1,17 @@
+"""Shared requests session factory for the scraping/download scripts."""
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def make_session() -> requests.Session:
+    """Session with keep-alive pooling and retry/backoff for transient HTTP errors."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=16,
+        max_retries=Retry(total=3, backoff_factor=0.3),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
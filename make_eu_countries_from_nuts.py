@@ -1,17 +1,23 @@
 # make_eu_countries_from_nuts.py
 # pip install geopandas shapely pyproj
 
-import geopandas as gpd
-
-nuts = gpd.read_file("NUTS_RG_60M_2024_4326.geojson").to_crs(4326)
+# pip install pyogrio
 
-# ország szint (LEVL_CODE==0) + szükséges oszlopok
-nuts0 = nuts[nuts["LEVL_CODE"]==0][["CNTR_CODE","geometry"]].copy()
-nuts0 = nuts0.rename(columns={"CNTR_CODE":"geo"})
+import geopandas as gpd
 
 # csak a kívánt országok (EU27 + NO, IS, CH, UK)
 keep = {'AT','BE','BG','HR','CY','CZ','DK','EE','FI','FR','DE','EL','HU','IE','IT','LV','LT','LU','MT','NL','PL','PT','RO','SK','SI','ES','SE','NO','IS','CH','UK'}
-nuts0 = nuts0[nuts0["geo"].isin(keep)].copy()
+
+# ország szint (LEVL_CODE==0) + szükséges oszlopok – a szűrést már az OGR olvasó végzi,
+# így a NUTS 1/2/3 poligonok be sem töltődnek
+codes = ",".join(f"'{c}'" for c in sorted(keep))
+nuts0 = gpd.read_file(
+    "NUTS_RG_60M_2024_4326.geojson",
+    engine="pyogrio",
+    where=f"LEVL_CODE = 0 AND CNTR_CODE IN ({codes})",
+    columns=["CNTR_CODE"],
+).to_crs(4326)
+nuts0 = nuts0[["CNTR_CODE","geometry"]].rename(columns={"CNTR_CODE":"geo"})
 
 # multipoligonok egységesítése (ha szükséges)
 nuts0 = nuts0.dissolve(by="geo", as_index=False)
@@ -3,8 +3,14 @@ import geopandas as gpd
 SRC = "NUTS_RG_60M_2024_4326.geojson"  # ha máshol van, add meg a teljes elérési utat
 DST = "nuts0_countries.geojson"
 
-gdf = gpd.read_file(SRC)
-gdf0 = gdf[gdf["LEVL_CODE"] == 0].copy()
+# LEVL_CODE == 0 szűrés és oszlopválasztás az OGR olvasóban (pyogrio), nem pandasban
+gdf0 = gpd.read_file(
+    SRC,
+    engine="pyogrio",
+    where="LEVL_CODE = 0",
+    columns=["CNTR_CODE","NUTS_ID","NAME_LATN","NUTS_NAME"],
+)
+# a pyogrio a fájl oszlopsorrendjében adja vissza az oszlopokat -> az eredeti sorrend visszaállítása
 keep = [c for c in ["CNTR_CODE","NUTS_ID","NAME_LATN","NUTS_NAME","geometry"] if c in gdf0.columns]
 gdf0 = gdf0[keep].to_crs(4326)
 gdf0.to_file(DST, driver="GeoJSON")
@@ -2,23 +2,31 @@
 import json
 from typing import List, Dict
 
-import requests
-from bs4 import BeautifulSoup
+from lxml import html
+
+from http_session import make_session
 
 URL = "https://history.state.gov/countries/all"
+# same scope as the old "div.col-md-6 a[href^='/countries/']" selector, evaluated by lxml in C
+COUNTRY_LINKS_XPATH = (
+    '//div[contains(concat(" ", normalize-space(@class), " "), " col-md-6 ")]'
+    '//a[starts-with(@href, "/countries/")]'
+)
+
+SESSION = make_session()
 
 
 def scrape_countries(url: str = URL) -> List[Dict[str, str | int]]:
     """Fetch the country list and return dictionaries with numeric id + name."""
-    response = requests.get(url, timeout=10)
+    response = SESSION.get(url, timeout=10)
     response.raise_for_status()
 
-    soup = BeautifulSoup(response.text, "html.parser")
+    tree = html.fromstring(response.text)
 
     countries: List[Dict[str, str | int]] = []
     seen_slugs: set[str] = set()
 
-    for link in soup.select("div.col-md-6 a[href^='/countries/']"):
+    for link in tree.xpath(COUNTRY_LINKS_XPATH):
         href = link.get("href", "").strip()
         if not href:
             continue
@@ -27,7 +35,7 @@ def scrape_countries(url: str = URL) -> List[Dict[str, str | int]]:
         if not slug or slug in seen_slugs:
             continue
 
-        name = " ".join(link.get_text(strip=True).split())
+        name = " ".join(link.text_content().split())
         if name.endswith("*"):
             continue
 
@@ -4,24 +4,29 @@ from __future__ import annotations
 import json
 from typing import Dict, List
 
-import requests
-from bs4 import BeautifulSoup
+from lxml import html
+
+from http_session import make_session
 
 URL = "https://www.iban.com/country-codes"
 
+SESSION = make_session()
+
 
 def scrape_country_codes(url: str = URL) -> List[Dict[str, str]]:
-    response = requests.get(url, timeout=10)
+    response = SESSION.get(url, timeout=10)
     response.raise_for_status()
 
-    soup = BeautifulSoup(response.text, "html.parser")
-    table = soup.select_one("table.downloads")
-    if table is None:
+    # lxml parses the page in C; the table is small but html.parser was the hot spot.
+    # Feed it the text requests already decoded, so no <meta charset> is needed.
+    tree = html.fromstring(response.text)
+    tables = tree.xpath('//table[contains(concat(" ", normalize-space(@class), " "), " downloads ")]')
+    if not tables:
         raise RuntimeError("Could not find country code table on page")
 
     entries: List[Dict[str, str]] = []
-    for row in table.select("tbody tr"):
-        cells = [cell.get_text(strip=True) for cell in row.select("td")]
+    for row in tables[0].xpath("./tbody/tr"):
+        cells = [cell.text_content().strip() for cell in row.xpath("./td")]
         if len(cells) < 2:
             continue
 
@@ -1,6 +1,7 @@
 import { Router, Request, Response } from 'express';
 import path from 'path';
 import fs from 'fs';
+import net from 'net';
 import { promisify } from 'util';
 import { execFile, spawn } from 'child_process';
 import { logger } from '../config/logger.config';
@@ -34,6 +35,10 @@ const PREDICT_SCRIPT_CANDIDATES = [
 
 const PYTHON_MAX_BUFFER = 1024 * 1024 * 64;
 
+// Long-lived python service (python_scripts/crop_service.py); the CLI scripts are the fallback.
+const CROP_SERVICE_SOCKET = process.env.CROP_SERVICE_SOCKET || '/tmp/seedsmart_crop_service.sock';
+const CROP_SERVICE_TIMEOUT_MS = 30000;
+
 const resolveFindTopCropScript = (): string => {
   for (const candidate of SCRIPT_CANDIDATES) {
     if (fs.existsSync(candidate)) return candidate;
@@ -64,6 +69,55 @@ const resolvePredictScript = (): string => {
   throw new Error(`train_profit_model.py script not found. Checked paths: ${searched}`);
 };
 
+/**
+ * Sends one request to crop_service.py. Resolves with the result, or with `undefined`
+ * when the service is not running so the caller can fall back to spawning the script.
+ */
+const queryCropService = (action: string, params: Record<string, unknown>): Promise<unknown | undefined> =>
+  new Promise((resolve, reject) => {
+    if (!fs.existsSync(CROP_SERVICE_SOCKET)) {
+      resolve(undefined);
+      return;
+    }
+
+    let connected = false;
+    let buffer = '';
+    const socket = net.createConnection(CROP_SERVICE_SOCKET);
+    socket.setEncoding('utf8');
+    socket.setTimeout(CROP_SERVICE_TIMEOUT_MS);
+
+    socket.on('connect', () => {
+      connected = true;
+      socket.write(`${JSON.stringify({ action, params })}\n`);
+    });
+    socket.on('data', (chunk) => {
+      buffer += chunk.toString();
+    });
+    socket.on('end', () => {
+      try {
+        const reply = JSON.parse(buffer.trim());
+        if (reply.ok) {
+          resolve(reply.result);
+        } else {
+          reject(new Error(reply.error));
+        }
+      } catch (error) {
+        reject(error);
+      }
+    });
+    socket.on('timeout', () => {
+      socket.destroy(new Error('crop service timed out'));
+    });
+    socket.on('error', (error) => {
+      if (connected) {
+        reject(error);
+      } else {
+        logger.warn('Crop service unavailable, falling back to script: %o', error);
+        resolve(undefined);
+      }
+    });
+  });
+
 const collectCategoryLabels = (input: unknown): string[] => {
   const labels: string[] = [];
   const seen = new Set<string>();
@@ -154,6 +208,21 @@ router.get('/predicate', async (req: Request, res: Response) => {
     categoriesArray.push(...categories.split(',').map((value) => value.trim()).filter(Boolean));
   }
 
+  try {
+    const servicePayload = await queryCropService('predicate', {
+      country: country.trim(),
+      year,
+      categories: categoriesArray,
+      top: 3,
+    });
+    if (servicePayload !== undefined) {
+      return res.status(200).json({ results: servicePayload });
+    }
+  } catch (error) {
+    logger.error('Crop service predicate query failed: %o', error);
+    return res.status(500).json({ error: 'Failed to compute prediction results' });
+  }
+
   let scriptPath: string;
   try {
     scriptPath = resolvePredictScript();
@@ -212,6 +281,17 @@ router.get('/sowingmap', async (req: Request, res: Response) => {
     return res.status(400).json({ error: 'coordinates query parameter is required' });
   }
 
+  try {
+    const servicePayload = await queryCropService('sowingmap', { coordinates: coordinates.trim() });
+    if (servicePayload !== undefined) {
+      res.set('Cache-Control', 'max-age=3600');
+      return res.status(200).json(transformFeatureCollectionTo4326(servicePayload));
+    }
+  } catch (err) {
+    logger.error('Crop service sowing map query failed: %o', err);
+    return res.status(500).json({ error: 'Failed to retrieve sowing map data' });
+  }
+
   let scriptPath: string;
   try {
     scriptPath = resolveSowingMapScript();
@@ -252,6 +332,22 @@ router.get('/topic', async (req: Request, res: Response) => {
     return res.status(400).json({ error: 'year query parameter must be a number' });
   }
 
+  const categoryLabels = collectCategoryLabels(rawCategoryInput);
+
+  try {
+    const servicePayload = await queryCropService('topic', {
+      country: country.trim(),
+      year: yearNumber,
+      category_labels: categoryLabels,
+    });
+    if (servicePayload !== undefined) {
+      return res.status(200).json(servicePayload);
+    }
+  } catch (err) {
+    logger.error('Crop service topic query failed: %o', err);
+    return res.status(500).json({ error: 'Failed to retrieve topic data' });
+  }
+
   let scriptPath: string;
   try {
     scriptPath = resolveFindTopCropScript();
@@ -260,8 +356,6 @@ router.get('/topic', async (req: Request, res: Response) => {
     return res.status(500).json({ error: 'Server misconfiguration: helper script not found' });
   }
 
-  const categoryLabels = collectCategoryLabels(rawCategoryInput);
-
   const args = ['--country', country.trim(), '--year', yearNumber.toString()];
   categoryLabels.forEach((label) => {
     args.push('--category_label', label);
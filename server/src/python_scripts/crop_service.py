@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Long-lived crop query service over a Unix domain socket.
+
+Keeps pandas/scikit-learn imported and the datasets (and the trained model) in
+memory, so each dashboard request only pays for the actual lookup instead of a
+fresh interpreter start + CSV parse. Protocol: one JSON request per connection,
+terminated by a newline:
+
+    {"action": "topic", "params": {"country": "Hungary", "year": 2024, "category_labels": ["arable"]}}
+    {"action": "predicate", "params": {"country": "Hungary", "year": 2025, "categories": [], "top": 3}}
+    {"action": "sowingmap", "params": {"coordinates": "19.0,47.4,19.2,47.6"}}
+
+The reply is a single JSON line: {"ok": true, "result": ...} or {"ok": false, "error": "..."}.
+The find_top_crop.py / train_profit_model.py / extract_sowingmap_features.py CLIs keep
+working on their own.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import extract_sowingmap_features
+import find_top_crop
+import train_profit_model
+
+DEFAULT_SOCKET_PATH = os.environ.get("CROP_SERVICE_SOCKET", "/tmp/seedsmart_crop_service.sock")
+
+
+class CropState:
+    """Datasets preloaded once per process; the model comes from the memoized load_model."""
+
+    def __init__(self) -> None:
+        find_top_crop.load_dataset()
+        self.profit_df = train_profit_model.load_dataset()
+        self._crops: Any = None
+        self._crops_lock = threading.Lock()
+
+    @property
+    def crops(self) -> Any:
+        # whole crop layer + its STRtree, built on first sowing-map request and reused for every bbox
+        with self._crops_lock:
+            if self._crops is None:
+                gdf = extract_sowingmap_features.load_crops(extract_sowingmap_features.DEFAULT_SHAPEFILE)
+                gdf.sindex  # build the spatial index now, not inside the first query
+                self._crops = gdf
+            return self._crops
+
+    @property
+    def model(self) -> Any:
+        # load_model is memoized per file mtime, so a retrained model is picked up without a restart
+        return train_profit_model.load_model()
+
+
+def handle_topic(state: CropState, params: Dict[str, Any]) -> Any:
+    return find_top_crop.build_payload(
+        str(params["country"]),
+        int(params["year"]),
+        params.get("category_labels") or None,
+    )
+
+
+def handle_predicate(state: CropState, params: Dict[str, Any]) -> Any:
+    suggestions = train_profit_model.suggest_crops(
+        state.model,
+        state.profit_df,
+        country=str(params["country"]),
+        categories=params.get("categories") or [],
+        target_year=int(params.get("year", 2025)),
+        top_k=int(params.get("top", 5)),
+    )
+    return json.loads(suggestions.to_json(orient="records"))
+
+
+def handle_sowingmap(state: CropState, params: Dict[str, Any]) -> Any:
+    bounds = extract_sowingmap_features.parse_coordinates(str(params["coordinates"]))
+    filtered = extract_sowingmap_features.filter_crops(state.crops, bounds)
+    return {
+        "count": int(len(filtered)),
+        "features": list(extract_sowingmap_features.iter_features(filtered)),
+    }
+
+
+HANDLERS: Dict[str, Callable[[CropState, Dict[str, Any]], Any]] = {
+    "topic": handle_topic,
+    "predicate": handle_predicate,
+    "sowingmap": handle_sowingmap,
+}
+
+
+class CropRequestHandler(socketserver.StreamRequestHandler):
+    server: "CropServer"
+
+    def handle(self) -> None:
+        try:
+            request = json.loads(self.rfile.readline())
+            handler = HANDLERS[request["action"]]
+            reply = {"ok": True, "result": handler(self.server.state, request.get("params") or {})}
+        except Exception as exc:  # report every failure to the caller instead of dropping the socket
+            reply = {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+        self.wfile.write(json.dumps(reply, ensure_ascii=False).encode("utf-8") + b"\n")
+
+
+class CropServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, state: CropState) -> None:
+        self.state = state
+        super().__init__(socket_path, CropRequestHandler)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="Unix socket path to listen on")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    state = CropState()
+    if os.path.exists(args.socket):
+        os.remove(args.socket)
+    with CropServer(args.socket, state) as server:
+        print(f"crop_service listening on {args.socket}", flush=True)
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
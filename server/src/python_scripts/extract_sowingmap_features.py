@@ -4,11 +4,14 @@
 from __future__ import annotations
 
 import argparse
-import json
+import sys
 from pathlib import Path
-from typing import List, Tuple
+from typing import BinaryIO, Iterator, Optional, Tuple
 
 import geopandas as gpd
+import orjson
+import pandas as pd
+import pyogrio
 from shapely.geometry import box, mapping
 
 PROJECT_ROOT = Path(__file__).resolve().parents[3]
@@ -26,10 +29,16 @@ def parse_coordinates(value: str) -> Tuple[float, float, float, float]:
         raise ValueError("Invalid bounds: expected min < max for both longitude and latitude")
     return min_lon, min_lat, max_lon, max_lat
 
-def load_crops(shapefile: Path) -> gpd.GeoDataFrame:
+def load_crops(shapefile: Path, bounds: Optional[Tuple[float, float, float, float]] = None) -> gpd.GeoDataFrame:
     if not shapefile.exists():
         raise FileNotFoundError(f"Shapefile not found: {shapefile}")
-    gdf = gpd.read_file(shapefile)
+    # A GeoSeries bbox is reprojected by geopandas to the file's CRS and pushed down to OGR,
+    # so only records whose envelope touches the bbox are materialized.
+    bbox = gpd.GeoSeries([box(*bounds)], crs="EPSG:4326") if bounds else None
+    # Only crop_group is emitted downstream; without it every attribute goes into "properties".
+    fields = pyogrio.read_info(shapefile)["fields"]
+    columns = ["crop_group"] if "crop_group" in fields else None
+    gdf = gpd.read_file(shapefile, engine="pyogrio", bbox=bbox, columns=columns)
     if gdf.crs is None:
         raise ValueError("Shapefile has no CRS defined; cannot interpret coordinates")
     if gdf.crs.to_epsg() != 4326:
@@ -39,21 +48,30 @@ def load_crops(shapefile: Path) -> gpd.GeoDataFrame:
 def filter_crops(gdf: gpd.GeoDataFrame, bounds: Tuple[float, float, float, float]) -> gpd.GeoDataFrame:
     min_lon, min_lat, max_lon, max_lat = bounds
     bbox = box(min_lon, min_lat, max_lon, max_lat)
-    return gdf[gdf.intersects(bbox)].copy()
+    # R-tree prefilter + exact intersects on the candidates only; sorted to keep file order
+    idx = gdf.sindex.query(bbox, predicate="intersects")
+    idx.sort()
+    return gdf.iloc[idx].copy()
 
-def to_features(gdf: gpd.GeoDataFrame) -> List[dict]:
-    features: List[dict] = []
-    crop_field = "crop_group" if "crop_group" in gdf.columns else None
-    for _, row in gdf.iterrows():
-        feature = {
-            "geometry": mapping(row.geometry),
-        }
-        if crop_field:
-            feature["crop_group"] = row[crop_field]
-        else:
-            feature["properties"] = row.drop(labels="geometry").to_dict()
-        features.append(feature)
-    return features
+def iter_features(gdf: gpd.GeoDataFrame) -> Iterator[dict]:
+    # column-wise extraction: no per-row Series boxing from iterrows
+    geoms = (mapping(geom) for geom in gdf.geometry.values)
+    if "crop_group" in gdf.columns:
+        groups = gdf["crop_group"].tolist()
+        return ({"geometry": geom, "crop_group": group} for geom, group in zip(geoms, groups))
+    prop_cols = [col for col in gdf.columns if col != gdf.geometry.name]
+    props = pd.DataFrame(gdf[prop_cols]).to_dict(orient="records")
+    return ({"geometry": geom, "properties": prop} for geom, prop in zip(geoms, props))
+
+def write_feature_collection(gdf: gpd.GeoDataFrame, out: BinaryIO) -> None:
+    """Stream {"count": N, "features": [...]} one feature at a time (no full payload in memory)."""
+    out.write(b'{"count":%d,"features":[' % len(gdf))
+    for i, feature in enumerate(iter_features(gdf)):
+        if i:
+            out.write(b",")
+        out.write(orjson.dumps(feature, option=orjson.OPT_SERIALIZE_NUMPY))
+    out.write(b"]}\n")
+    out.flush()
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description=__doc__)
@@ -64,13 +82,10 @@ def parse_args() -> argparse.Namespace:
 def main() -> None:
     args = parse_args()
     bounds = parse_coordinates(args.coordinates)
-    gdf = load_crops(Path(args.shapefile))
+    gdf = load_crops(Path(args.shapefile), bounds)
+    # exact geometry test; the reader only filtered on envelopes
     filtered = filter_crops(gdf, bounds)
-    result = {
-        "count": int(len(filtered)),
-        "features": to_features(filtered),
-    }
-    print(json.dumps(result, ensure_ascii=False))
+    write_feature_collection(filtered, sys.stdout.buffer)
 
 if __name__ == "__main__":
     main()
@@ -8,8 +8,11 @@ import argparse
 import csv
 import io
 import json
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
 
 CSV_FILENAME = "alap_kiegeszitve_costs_full_modded.csv"
 
@@ -35,10 +38,8 @@ def locate_csv() -> Path:
     raise FileNotFoundError("CSV file not found. Checked: " + ", ".join(searched))
 
 
-def sniff_delimiter(path: Path) -> str:
-    """Try to detect delimiter, default to ';' if unsure (common in EU CSVs)."""
-    with path.open("r", encoding="utf-8", newline="") as f:
-        sample = f.read(4096)
+def sniff_delimiter(sample: str) -> str:
+    """Try to detect delimiter from the head of the file, default to ';' if unsure (common in EU CSVs)."""
     try:
         dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
         return dialect.delimiter
@@ -71,46 +72,25 @@ def parse_category_inputs(raw_values: Optional[List[str]]) -> List[str]:
     return categories
 
 
-def to_float_mixed(num: Any) -> Optional[float]:
+def parse_mixed_floats(values: pd.Series) -> pd.Series:
     """
-    Convert strings like '1,234.56', '1.234,56', '4835,25', '3862,9' to float.
-    Returns None if not parseable.
+    Vectorized conversion of strings like '1,234.56', '1.234,56', '4835,25', '3862,9'
+    to float for a whole column. Unparseable cells become NaN.
     """
-    if num is None:
-        return None
-    s = str(num).strip()
-    if s == "" or s.lower() == "nan":
-        return None
+    s = values.astype(str).str.strip().str.replace(r"[\xa0 ]", "", regex=True)
+    has_comma = s.str.contains(",", regex=False)
+    has_dot = s.str.contains(".", regex=False)
 
-    # remove non-breaking spaces / normal spaces
-    s = s.replace("\xa0", "").replace(" ", "")
-
-    # Case 1: both '.' and ',' present -> assume thousands + decimal
-    if "," in s and "." in s:
-        # Heuristic: if last comma occurs after last dot => comma is decimal
-        if s.rfind(",") > s.rfind("."):
-            s = s.replace(".", "")      # remove thousands dots
-            s = s.replace(",", ".")     # convert decimal comma
-        else:
-            s = s.replace(",", "")      # remove thousands commas
-        try:
-            return float(s)
-        except ValueError:
-            return None
-
-    # Case 2: only comma present -> treat comma as decimal
-    if "," in s:
-        s = s.replace(",", ".")
-        try:
-            return float(s)
-        except ValueError:
-            return None
-
-    # Case 3: only dot or pure digits
-    try:
-        return float(s)
-    except ValueError:
-        return None
+    # both '.' and ',' present -> whichever comes last is the decimal separator
+    both = has_comma & has_dot
+    comma_decimal = both & (s.str.rfind(",") > s.str.rfind("."))
+    s = s.mask(comma_decimal, s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    s = s.mask(both & ~comma_decimal, s.str.replace(",", "", regex=False))
+
+    # only comma present -> treat comma as decimal
+    s = s.mask(has_comma & ~has_dot, s.str.replace(",", ".", regex=False))
+
+    return pd.to_numeric(s, errors="coerce")
 
 
 # ----------------------------- core ----------------------------- #
@@ -130,87 +110,97 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
-def load_filtered_rows(country: str, year: int) -> List[Tuple[float, Dict[str, Any]]]:
-    """
-    Returns rows matching country/year as tuples:
-      (ratio, row_dict_with_numeric_fields)
-    Drops rows where price or cost is missing / <= 0.
-    """
-    country_norm = normalize(country)
-    rows: List[Tuple[float, Dict[str, Any]]] = []
+def load_dataset(path: Path = CSV_PATH) -> pd.DataFrame:
+    """Parsed CSV (all columns as text + _price_num/_cost_num), memoized per file mtime."""
+    return _read_dataset(str(path), path.stat().st_mtime)
 
-    delimiter = sniff_delimiter(CSV_PATH)
 
-    with CSV_PATH.open("r", encoding="utf-8", newline="") as csvfile:
-        reader = csv.DictReader(csvfile, delimiter=delimiter)
-        for row in reader:
-            # year filter
-            try:
-                row_year = int(str(row.get("year", "")).strip())
-            except ValueError:
-                continue
-            if row_year != year:
-                continue
+@lru_cache(maxsize=2)
+def _read_dataset(path: str, mtime: float) -> pd.DataFrame:
+    # parsed copy next to the CSV; reused while it is at least as new as the CSV
+    cache_path = Path(path).with_suffix(".feather")
+    if cache_path.exists() and cache_path.stat().st_mtime >= mtime:
+        return pd.read_feather(cache_path)
 
-            # country filter
-            if country_norm and normalize(row.get("country")) != country_norm:
-                continue
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        # sniff from the first chunk, then rewind and parse from the same handle
+        delimiter = sniff_delimiter(f.read(4096))
+        f.seek(0)
+        # read everything as text (like DictReader) and parse the numeric columns in one pass each
+        df = pd.read_csv(f, sep=delimiter, dtype=str, keep_default_na=False)
+    df["_price_num"] = parse_mixed_floats(df["price_eur_tonne"])
+    df["_cost_num"] = parse_mixed_floats(df["cost_eur_tonne"])
+    try:
+        df.to_feather(cache_path)
+    except OSError:
+        pass  # read-only location: just skip the cache
+    return df
 
-            price = to_float_mixed(row.get("price_eur_tonne"))
-            cost = to_float_mixed(row.get("cost_eur_tonne"))
-            if price is None or cost is None or cost <= 0:
-                continue
 
-            ratio = price / cost
+def normalize_series(values: pd.Series) -> pd.Series:
+    return values.str.strip().str.lower()
 
-            # carry numeric fields back for transparency
-            row_out = dict(row)
-            row_out["_price_num"] = price
-            row_out["_cost_num"] = cost
-            row_out["_ratio"] = ratio
 
-            rows.append((ratio, row_out))
+def load_filtered_rows(country: str, year: int) -> pd.DataFrame:
+    """
+    Returns rows matching country/year, with numeric _price_num, _cost_num and _ratio columns.
+    Drops rows where price or cost is missing / <= 0.
+    """
+    df = load_dataset()
+    country_norm = normalize(country)
+
+    mask = pd.to_numeric(df["year"].str.strip(), errors="coerce") == year
+    if country_norm:
+        mask &= normalize_series(df["country"]) == country_norm
+    mask &= df["_price_num"].notna() & (df["_cost_num"] > 0)
 
+    rows = df[mask].copy()
+    rows["_ratio"] = rows["_price_num"] / rows["_cost_num"]
     return rows
 
 
+def best_index_by_category(rows: pd.DataFrame) -> Dict[str, List[Any]]:
+    """
+    One groupby-idxmax per field: normalized category_key / category_label value
+    -> index labels of the max-ratio row(s) for that value.
+    """
+    lookup: Dict[str, List[Any]] = {}
+    for column in ("category_key", "category_label"):
+        best = rows.groupby(normalize_series(rows[column]))["_ratio"].idxmax()
+        for value, idx in best.items():
+            lookup.setdefault(value, []).append(idx)
+    return lookup
+
+
 def find_best_for_category(
-    rows: List[Tuple[float, Dict[str, Any]]],
+    rows: pd.DataFrame,
     category_norm: Optional[str],
+    lookup: Dict[str, List[Any]],
 ) -> Optional[Dict[str, Any]]:
     """
-    Pick max ratio; if category_norm is provided, filter by either category_label or category_key.
+    Pick max ratio; if category_norm is provided, match it against either category_label or category_key.
     """
-    best_row: Optional[Dict[str, Any]] = None
-    best_ratio: Optional[float] = None
-
-    for ratio, row in rows:
-        if category_norm:
-            labels = {
-                normalize(row.get("category_label")),
-                normalize(row.get("category_key")),
-            }
-            if category_norm not in labels:
-                continue
-
-        if best_ratio is None or ratio > best_ratio:
-            best_ratio = ratio
-            best_row = row
-
-    return best_row
+    if not category_norm:
+        return None if rows.empty else rows.loc[rows["_ratio"].idxmax()].to_dict()
+    candidates = lookup.get(category_norm)
+    if not candidates:
+        return None
+    # ties keep the earliest row, like idxmax
+    best = max(sorted(set(candidates)), key=lambda idx: rows.at[idx, "_ratio"])
+    return rows.loc[best].to_dict()
 
 
-def main() -> None:
-    args = parse_args()
-    categories = parse_category_inputs(args.category_labels)
-    rows = load_filtered_rows(args.country, args.year)
+def build_payload(country: str, year: int, category_labels: Optional[List[str]]) -> Dict[str, Any]:
+    categories = parse_category_inputs(category_labels)
+    rows = load_filtered_rows(country, year)
 
     query_categories: List[Optional[str]] = categories if categories else [None]
+    lookup = best_index_by_category(rows) if categories else {}
 
     results = []
     for category in query_categories:
         normalized = normalize(category) if category is not None else None
-        record = find_best_for_category(rows, normalized)
+        record = find_best_for_category(rows, normalized, lookup)
         results.append(
             {
                 "requested_category": category,
@@ -220,22 +210,25 @@ def main() -> None:
         )
 
     if categories:
-        payload = {
+        return {
             "found": any(result["found"] for result in results),
-            "country": args.country,
-            "year": args.year,
+            "country": country,
+            "year": year,
             "requested_categories": categories,
             "results": results,
         }
-    else:
-        payload = {
-            "found": results[0]["found"],
-            "country": args.country,
-            "year": args.year,
-            "requested_categories": None,
-            "record": results[0]["record"],
-        }
+    return {
+        "found": results[0]["found"],
+        "country": country,
+        "year": year,
+        "requested_categories": None,
+        "record": results[0]["record"],
+    }
+
 
+def main() -> None:
+    args = parse_args()
+    payload = build_payload(args.country, args.year, args.category_labels)
     print(json.dumps(payload, ensure_ascii=False))
 
 
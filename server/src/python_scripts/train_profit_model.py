@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
-"""Train a random-forest model that predicts crop profitability for the next season.
+"""Train a gradient-boosting model that predicts crop profitability for the next season.
 
 The script reads the enriched historical dataset (`alap_kiegeszitve_costs_full.csv`),
-trains a RandomForestRegressor on the last 24 years of EU crop data, persists the
+trains a HistGradientBoostingRegressor on the last 24 years of EU crop data, persists the
 pipeline, and exposes a helper for generating ranked crop suggestions given a
 country/category selection.
 """
@@ -11,6 +11,7 @@ from __future__ import annotations
 
 import argparse
 import json
+from functools import lru_cache
 from pathlib import Path
 from typing import Iterable
 
@@ -18,15 +19,17 @@ import joblib
 import numpy as np
 import pandas as pd
 from sklearn.compose import ColumnTransformer
-from sklearn.ensemble import RandomForestRegressor
+from sklearn.ensemble import HistGradientBoostingRegressor
 from sklearn.metrics import mean_absolute_error, r2_score
 from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import OneHotEncoder
+from sklearn.preprocessing import OrdinalEncoder
 
 REPO_ROOT = Path(__file__).resolve().parents[3]
 DATA_PATH = REPO_ROOT / "alap_kiegeszitve_costs_full.csv"
 MODEL_DIR = REPO_ROOT / "server" / "models"
-MODEL_PATH = MODEL_DIR / "random_forest_profit.pkl"
+MODEL_PATH = MODEL_DIR / "profit_model_hgb.pkl"
+# stored with the pickle so a model trained by an older version of this script is rejected on load
+MODEL_KIND = "hist_gradient_boosting"
 
 CATEGORICAL_FEATURES = ["country", "category_key", "product", "Soil Type"]
 NUMERIC_FEATURES = [
@@ -40,12 +43,24 @@ NUMERIC_FEATURES = [
 FEATURE_COLUMNS = CATEGORICAL_FEATURES + NUMERIC_FEATURES
 TARGET_COLUMN = "profit_eur_tonne"
 
-def load_dataset(path: Path = DATA_PATH) -> pd.DataFrame:
+def load_dataset(path: Path = DATA_PATH, refresh: bool = False) -> pd.DataFrame:
+    """Cleaned training frame; cached as parquet next to the CSV and reused while newer than it."""
     if not path.exists():
         raise FileNotFoundError(f"Dataset not found: {path}")
 
-    df = pd.read_csv(path, sep=";")
+    cache_path = path.with_suffix(".parquet")
+    if not refresh and cache_path.exists() and cache_path.stat().st_mtime >= path.stat().st_mtime:
+        return pd.read_parquet(cache_path, engine="pyarrow")
 
+    df = _parse_dataset(path)
+    try:
+        df.to_parquet(cache_path, engine="pyarrow", compression="zstd")
+    except OSError:
+        pass  # read-only location: just skip the cache
+    return df
+
+
+def _parse_dataset(path: Path) -> pd.DataFrame:
     float_columns = [
         "price_eur_tonne",
         "Humidity(%)",
@@ -55,23 +70,25 @@ def load_dataset(path: Path = DATA_PATH) -> pd.DataFrame:
         "Phosphorous(mg/Kg)",
         "cost_eur_tonne",
     ]
-    for col in float_columns:
-        df[col] = (
-            df[col]
-            .astype(str)
-            .str.replace(",", ".", regex=False)
-            .replace({"nan": np.nan})
-            .astype(float)
-        )
+    # the C parser handles the decimal commas directly
+    df = pd.read_csv(
+        path,
+        sep=";",
+        decimal=",",
+        na_values=["nan", ""],
+        dtype={col: "float64" for col in float_columns},
+    )
 
     df["profit_eur_tonne"] = df["price_eur_tonne"] - df["cost_eur_tonne"]
-    df[TARGET_COLUMN] = np.where(
-        df["cost_eur_tonne"] > 0,
-        df["profit_eur_tonne"] / df["cost_eur_tonne"],
-        np.nan,
-    )
+    # divide only where cost > 0; the other lanes stay NaN (no wasted divisions / warnings)
+    cost = df["cost_eur_tonne"].to_numpy()
+    margin = np.full(len(df), np.nan)
+    np.divide(df["profit_eur_tonne"].to_numpy(), cost, out=margin, where=cost > 0)
+    df[TARGET_COLUMN] = margin
 
     df = df.dropna(subset=FEATURE_COLUMNS + [TARGET_COLUMN])
+    # low-cardinality strings -> category codes (cheaper filters/groupbys, smaller frame)
+    df = df.astype({col: "category" for col in CATEGORICAL_FEATURES})
 
     return df
 
@@ -81,7 +98,12 @@ def build_pipeline() -> Pipeline:
         transformers=[
             (
                 "cat",
-                OneHotEncoder(handle_unknown="ignore"),
+                # dense integer codes; unseen categories -> -1, which the model treats as missing
+                OrdinalEncoder(
+                    handle_unknown="use_encoded_value",
+                    unknown_value=-1,
+                    dtype=np.int32,
+                ),
                 CATEGORICAL_FEATURES,
             ),
             (
@@ -92,12 +114,13 @@ def build_pipeline() -> Pipeline:
         ]
     )
 
-    model = RandomForestRegressor(
-        n_estimators=400,
-        max_depth=None,
-        min_samples_leaf=3,
+    # the ColumnTransformer emits the categorical columns first
+    model = HistGradientBoostingRegressor(
+        max_iter=400,
+        learning_rate=0.05,
+        categorical_features=list(range(len(CATEGORICAL_FEATURES))),
+        early_stopping=True,
         random_state=42,
-        n_jobs=-1,
     )
 
     pipeline = Pipeline([
@@ -132,7 +155,10 @@ def train_model(df: pd.DataFrame) -> dict:
     }
 
     MODEL_DIR.mkdir(parents=True, exist_ok=True)
-    joblib.dump({"pipeline": pipeline, "feature_columns": FEATURE_COLUMNS}, MODEL_PATH)
+    joblib.dump(
+        {"pipeline": pipeline, "feature_columns": FEATURE_COLUMNS, "model_kind": MODEL_KIND},
+        MODEL_PATH,
+    )
 
     return metrics
 
@@ -142,7 +168,18 @@ def load_model(path: Path = MODEL_PATH) -> Pipeline:
         raise FileNotFoundError(
             f"Model not found at {path}. Run train_profit_model.py to train it first."
         )
+    return _load_pipeline(str(path), path.stat().st_mtime)
+
+
+@lru_cache(maxsize=2)
+def _load_pipeline(path: str, mtime: float) -> Pipeline:
+    # memoized per file mtime: long-lived callers skip unpickling and pick up retrained models
     payload = joblib.load(path)
+    if payload.get("model_kind") != MODEL_KIND:
+        raise ValueError(
+            f"Model at {path} was not trained as {MODEL_KIND}. "
+            "Run train_profit_model.py to retrain it."
+        )
     return payload["pipeline"]
 
 
@@ -157,10 +194,15 @@ def prepare_candidate_matrix(
     categories = set(categories)
     start_year = target_year - lookback_years
 
+    # case-insensitive country match on the (few) categories, then an integer code compare per row
+    country_lc = country.lower()
+    country_codes = [
+        code for code, name in enumerate(df["country"].cat.categories) if str(name).lower() == country_lc
+    ]
+
     subset = df[
-        (df["country"].str.lower() == country.lower())
-        & (df["year"] >= start_year)
-        & (df["year"] < target_year)
+        df["country"].cat.codes.isin(country_codes)
+        & df["year"].between(start_year, target_year - 1)
         & (df["category_key"].isin(categories) if categories else True)
     ].copy()
 
@@ -169,7 +211,7 @@ def prepare_candidate_matrix(
 
     aggregated = (
         subset
-        .groupby(["product", "category_key", "Soil Type"], as_index=False)
+        .groupby(["product", "category_key", "Soil Type"], as_index=False, observed=True)
         .agg({
             "year": "max",
             "country": "first",
@@ -201,8 +243,13 @@ def suggest_crops(
         target_year=target_year,
     )
     preds = model.predict(candidates[FEATURE_COLUMNS])
-    candidates = candidates.assign(predicted_profit_margin=preds)
-    return candidates.sort_values("predicted_profit_margin", ascending=False).head(top_k)
+    k = min(top_k, len(preds))
+    if k <= 0:
+        return candidates.iloc[:0].assign(predicted_profit_margin=preds[:0])
+    # partial selection of the top k, then sort only those
+    idx = np.argpartition(-preds, k - 1)[:k]
+    idx = idx[np.argsort(-preds[idx], kind="stable")]
+    return candidates.iloc[idx].assign(predicted_profit_margin=preds[idx])
 
 
 def main() -> None:
@@ -226,6 +273,11 @@ def main() -> None:
         default=2025,
         help="Target year for suggestion inference (default: 2025).",
     )
+    parser.add_argument(
+        "--refresh-cache",
+        action="store_true",
+        help="Re-parse the CSV even if the cached parquet copy is up to date.",
+    )
     parser.add_argument(
         "--top",
         type=int,
@@ -234,7 +286,7 @@ def main() -> None:
     )
     args = parser.parse_args()
 
-    df = load_dataset()
+    df = load_dataset(refresh=args.refresh_cache)
 
     if args.suggest:
         if not args.country:
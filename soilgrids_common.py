@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Közös segédek a SoilGrids scriptekhez (soilgrids_country_join.py, soilgrids_eu_0_5cm_export.py):
+ország-poligonok (GeoParquet cache), GDAL HTTP beállítások, raszter megnyitás + vágás,
+csempénkénti címkeraszter és bincount zónaátlag.
+"""
+
+import os
+
+import dask
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import pyogrio
+import xarray as xr
+import rioxarray as rxr
+from rasterio.features import rasterize
+from rasterio.windows import Window, bounds as window_bounds, transform as window_transform
+from shapely import STRtree
+from shapely.geometry import box
+
+# minden gpd.read_file / to_file a pyogrio motorral (GDAL tömeges C API) megy, nem fionával
+gpd.options.io_engine = "pyogrio"
+
+# GDAL beállítások a távoli SoilGrids rasztereknél. Környezeti változóként adjuk meg, mert a
+# rasterio.Env szálanként külön él, a változók viszont párhuzamos szálakban töltődnek:
+# összevont range-kérések, HTTP/2 multiplex, közös /vsicurl/ blokk-cache, és a GDAL ne indítson
+# még saját szálakat is.
+GDAL_ENV = {
+    "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES",
+    "GDAL_HTTP_MULTIPLEX": "YES",
+    "GDAL_HTTP_VERSION": "2",
+    "CPL_VSIL_CURL_CACHE_SIZE": "536870912",
+    "VSI_CACHE": "TRUE",
+    "VSI_CACHE_SIZE": "1000000000",
+    "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+    "CPL_VSIL_CURL_ALLOWED_EXTENSIONS": ".tif,.vrt",
+    "GDAL_NUM_THREADS": "1",
+}
+
+# dask csempeméret a távoli raszterekhez
+CHUNKS = {"x": 1024, "y": 1024, "band": 1}
+
+# ennyi SoilGrids változó fut egyszerre; mindegyik saját dask gráfot számol, így a memória ezzel skálázódik
+VAR_WORKERS = 2
+
+# Európa kiterjedése (lon/lat): az Azori- és Kanári-szigetek, Izland és Ciprus benne van, a tengerentúli
+# francia/portugál/spanyol területek és a Svalbard nincs. Ezek nélkül a vágási ablak nem fedi az Atlanti-óceánt.
+EUROPE_BOUNDS = (-32.0, 27.0, 45.0, 72.0)
+
+
+def ensure_countries_gdf(countries_path: str, fallback_nuts_path: str, cache_path: str) -> gpd.GeoDataFrame:
+    """
+    Ország-poligonok (NUTS0) GeoDataFrame-ként, GeoParquet cache-sel.
+    Forrás: az ország-GeoJSON, ha nincs, a NUTS fájl (LEVL_CODE=0). A cache-t csak akkor használjuk,
+    ha nem régebbi a forrásnál, különben újraépítjük. Elvárt kulcsoszlop: CNTR_CODE (ISO2).
+    """
+    source = countries_path if os.path.exists(countries_path) else fallback_nuts_path
+    if os.path.exists(cache_path) and (
+        not os.path.exists(source) or os.path.getmtime(cache_path) >= os.path.getmtime(source)
+    ):
+        print(f"Ország-cache megvan: {cache_path}")
+        return gpd.read_parquet(cache_path)
+
+    if source == countries_path:
+        print(f"Ország-GeoJSON megvan: {countries_path}")
+        gdf0 = gpd.read_file(countries_path)
+    else:
+        if not os.path.exists(fallback_nuts_path):
+            raise SystemExit(
+                f"Hiányzik a {countries_path}, és a fallback NUTS fájl sem található: {fallback_nuts_path}"
+            )
+        print(f"{countries_path} nem található – előállítás {fallback_nuts_path} alapján (LEVL_CODE=0)...")
+        fields = list(pyogrio.read_info(fallback_nuts_path)["fields"])
+        if "LEVL_CODE" not in fields:
+            raise SystemExit("A NUTS forrásban nincs 'LEVL_CODE' oszlop.")
+        # oszlop- és sorszűrés az OGR-ben, nem pandasban
+        keep = [c for c in ["CNTR_CODE", "NUTS_ID", "NAME_LATN", "NUTS_NAME"] if c in fields]
+        gdf0 = pyogrio.read_dataframe(fallback_nuts_path, columns=keep, where="LEVL_CODE = 0")
+        gdf0 = gdf0[keep + ["geometry"]]  # a pyogrio a fájl oszlopsorrendjét adja vissza
+
+    if gdf0.crs is None or gdf0.crs.to_epsg() != 4326:
+        gdf0 = gdf0.to_crs(4326)
+    gdf0.to_parquet(cache_path)
+    print(f"Ország-cache előállítva: {cache_path} ({len(gdf0)} rekord)")
+    return gdf0
+
+
+def apply_gdal_env() -> None:
+    """A GDAL_ENV értékei alapértelmezésként (a felhasználó által megadott env változók nyernek)."""
+    for key, value in GDAL_ENV.items():
+        os.environ.setdefault(key, value)
+
+
+def europe_bounds(gdf: gpd.GeoDataFrame, crs) -> tuple:
+    """A gdf európai (EUROPE_BOUNDS-ba eső) poligonrészeinek befoglaló téglalapja a megadott CRS-ben."""
+    parts = gdf.geometry.explode(index_parts=False)
+    parts = parts[parts.intersects(box(*EUROPE_BOUNDS))]
+    return tuple(parts.to_crs(crs).total_bounds)
+
+
+def open_soilgrids(url: str, gdf: gpd.GeoDataFrame) -> xr.DataArray:
+    """
+    Lustán megnyit egy SoilGrids rasztert /vsicurl/-en át (dask csempékkel), float32-re váltja
+    és az országok európai részeinek befoglaló téglalapjára vágja, így csak az európai ablak töltődik be
+    (a tengerentúli területek kimaradnak az ország-átlagokból).
+    """
+    da = rxr.open_rasterio(f"/vsicurl/{url}", masked=True, chunks=CHUNKS).squeeze()  # (y,x)
+    # SoilGrids natívan int16 (skálázva): float32 bőven elég, fele annyi bájt a float64-hez képest
+    da = da.astype("float32")
+    # biztos ami biztos: legyen térinformatikai meta
+    if not da.rio.crs:
+        da = da.rio.write_crs(4326)
+    return da.rio.clip_box(*europe_bounds(gdf, da.rio.crs))
+
+
+def _block_sums(values: np.ndarray, window: Window, transform, geoms: np.ndarray, tree: STRtree, n: int) -> np.ndarray:
+    """Egy csempe részösszegei címkénként: (2, n) tömb [értékösszeg, pixelszám]."""
+    out = np.zeros((2, n))
+    idx = tree.query(box(*window_bounds(window, transform)), predicate="intersects")
+    if len(idx) == 0:
+        return out
+    # csak a csempét érintő országokat raszterizáljuk, csak a csempe méretében (pixelközéppont-szabály)
+    labels = rasterize(
+        ((geoms[i], i + 1) for i in idx),
+        out_shape=values.shape,
+        transform=window_transform(window, transform),
+        fill=0,
+        dtype="uint16",
+    )
+    valid = (labels > 0) & ~np.isnan(values)
+    out[0] = np.bincount(labels[valid], weights=values[valid], minlength=n)
+    out[1] = np.bincount(labels[valid], minlength=n)
+    return out
+
+
+def zonal_means_bincount(da: xr.DataArray, gdf: gpd.GeoDataFrame, key_col: str, name: str) -> pd.DataFrame:
+    """
+    Ország-átlagok dask csempénként (NaN kihagyva): minden csempén raszterizáljuk az érintett országokat,
+    bincount-tal részösszeget és pixelszámot képzünk, és ezeket adjuk össze. Sem a raszter, sem a
+    címkeraszter nem kerül egészben a memóriába.
+    """
+    if da.chunks is None:
+        da = da.chunk({"y": CHUNKS["y"], "x": CHUNKS["x"]})
+    data = da.transpose("y", "x").data
+    transform = da.rio.transform()
+    geoms = gdf.to_crs(da.rio.crs).geometry.to_numpy()
+    tree = STRtree(geoms)
+    n = len(geoms) + 1
+
+    row_chunks, col_chunks = data.chunks
+    row_offs = np.cumsum((0,) + row_chunks[:-1])
+    col_offs = np.cumsum((0,) + col_chunks[:-1])
+    blocks = data.to_delayed()
+    block_sums = dask.delayed(_block_sums)
+    parts = [
+        block_sums(blocks[i, j], Window(col_offs[j], row_offs[i], w, h), transform, geoms, tree, n)
+        for i, h in enumerate(row_chunks)
+        for j, w in enumerate(col_chunks)
+    ]
+    sums, counts = np.sum(dask.compute(*parts), axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+    return pd.DataFrame({key_col: gdf[key_col].values, name: means[1:]})
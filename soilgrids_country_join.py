@@ -13,18 +13,24 @@ Bemenet (ugyanabban a mappában):
 """
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Tuple
 
+import dask
+import numpy as np
 import pandas as pd
 import geopandas as gpd
 import xarray as xr
-import rioxarray as rxr
-from rasterstats import zonal_stats
 from tqdm import tqdm
 
+from soilgrids_common import (
+    VAR_WORKERS, apply_gdal_env, ensure_countries_gdf, open_soilgrids, zonal_means_bincount,
+)
+
 # ==== BEMENETI UTAK (ha máshol vannak, állítsd át) ====
 COUNTRIES_PATH = "nuts0_countries.geojson"                # ezt preferáljuk
 FALLBACK_NUTS_PATH = "NUTS_RG_60M_2024_4326.geojson"      # ha az előző nincs, ebből készítünk NUTS0-t
+COUNTRIES_CACHE = "nuts0_countries.parquet"               # GeoParquet cache a fenti kettő helyett
 ALL_CSV = "all_products_prices_6cats_2000_2024.csv"
 TOP_CSV = "top_products_prices_6cats_2000_2024.csv"
 
@@ -55,34 +61,8 @@ DEPTHS: List[Tuple[str, int]] = [
     ("5-15cm", 10),
     ("15-30cm",15),
 ]
-TOTAL_THICK = sum(w for _, w in DEPTHS)
-
-
-def ensure_countries_geojson(countries_path: str, fallback_nuts_path: str) -> str:
-    """
-    Ha nincs ország-GeoJSON, készít egyet a NUTS fájlból (LEVL_CODE=0).
-    Elvárt kulcsoszlop: CNTR_CODE (ISO2).
-    """
-    if os.path.exists(countries_path):
-        print(f"Ország-GeoJSON megvan: {countries_path}")
-        return countries_path
-
-    if not os.path.exists(fallback_nuts_path):
-        raise SystemExit(
-            f"Hiányzik a {countries_path}, és a fallback NUTS fájl sem található: {fallback_nuts_path}"
-        )
 
-    print(f"{countries_path} nem található – előállítás {fallback_nuts_path} alapján (LEVL_CODE=0)...")
-    gdf = gpd.read_file(fallback_nuts_path)
-    if "LEVL_CODE" not in gdf.columns:
-        raise SystemExit("A NUTS forrásban nincs 'LEVL_CODE' oszlop.")
-
-    gdf0 = gdf[gdf["LEVL_CODE"] == 0].copy()
-    keep = [c for c in ["CNTR_CODE", "NUTS_ID", "NAME_LATN", "NUTS_NAME", "geometry"] if c in gdf0.columns]
-    gdf0 = gdf0[keep].to_crs(4326)
-    gdf0.to_file(countries_path, driver="GeoJSON")
-    print(f"Ország-GeoJSON előállítva: {countries_path} ({len(gdf0)} rekord)")
-    return countries_path
+apply_gdal_env()
 
 
 def cog_url(var_key: str, depth: str) -> str:
@@ -91,60 +71,42 @@ def cog_url(var_key: str, depth: str) -> str:
     return f"{SG_BASE}/{sub}/{sub}_{depth}_mean.tif"
 
 
-def load_weighted_0_30(var_key: str) -> xr.DataArray:
+def load_weighted_0_30(var_key: str, gdf: gpd.GeoDataFrame) -> xr.DataArray:
     """
     Betölti a három mélységi rasztert és vastagság-súlyozott átlagot képez (0–30 cm).
-    A visszatérő DataArray 2D (y, x), CRS/EPSG:4326.
+    A rasztereket a gdf befoglaló téglalapjára vágjuk, így csak az európai ablakot olvassuk.
+    A visszatérő DataArray 2D (y, x), a SoilGrids natív rácsán (Homolosine) – nem vetítjük át,
+    a zónastatisztika a poligonokat vetíti a raszter CRS-ébe.
     """
     arrays = []
     for depth, w in DEPTHS:
         url = cog_url(var_key, depth)
-        da = rxr.open_rasterio(url, masked=True).squeeze()  # (y,x)
-        # biztos ami biztos: legyen térinformatikai meta
-        if not da.rio.crs:
-            da = da.rio.write_crs(4326)
-        arrays.append((da, w))
+        # lusta megnyitás + vágás: a globális raszterből csak az országok bbox-ának ablaka töltődik be
+        arrays.append((open_soilgrids(url, gdf), w))
 
-    # illesszük egymáshoz és számoljuk a súlyozott átlagot
+    # a mélységek ugyanazon a SoilGrids rácson vannak (azonos vágással) -> nincs reprojektálás,
+    # csak ellenőrizzük; a súlyozott átlagot dask csempénként számolja (egy menet, korlátos memória)
     base = arrays[0][0]
-    acc = xr.zeros_like(base, dtype="float32")
-    wsum = 0.0
-    for da, w in arrays:
-        if (da.rio.crs != base.rio.crs) or (da.rio.transform() != base.rio.transform()):
-            da = da.rio.reproject_match(base)
-        acc = xr.where(da.notnull(), acc + da * w, acc)
-        wsum += w
-
-    out = acc / wsum
+    if any(
+        da.rio.crs != base.rio.crs or da.rio.transform() != base.rio.transform() or da.shape != base.shape
+        for da, _ in arrays[1:]
+    ):
+        raise SystemExit(f"A(z) {var_key} mélységi rétegei nem azonos rácson vannak.")
+    stacked = xr.concat([da for da, _ in arrays], dim="depth")
+    weights = xr.DataArray(np.array([w for _, w in arrays], dtype=np.float32), dims="depth")
+    num = (stacked * weights).sum("depth", skipna=True)
+    # csak a nem-NaN rétegek súlya kerül a nevezőbe; 0/0 -> NaN ott, ahol egyik mélység sem ad értéket
+    den = weights.where(stacked.notnull()).sum("depth")
+    out = (num / den).astype(np.float32)  # lusta marad: a zónaátlag csempénként számolja ki
+
     out.name = f"{var_key}_0_30cm"
-    return out
+    return out.rio.write_crs(base.rio.crs)
 
 
-def country_zonal_mean(da: xr.DataArray, gdf: gpd.GeoDataFrame, key_col: str = "CNTR_CODE") -> pd.DataFrame:
-    """
-    Zónastatisztika: országpoligonokra átlag a megadott DataArray-ből.
-    A rasterstats-hoz ideiglenes GeoTIFF-et írunk.
-    """
-    tmp_path = f"_tmp_{da.name}.tif"
-    da.rio.to_raster(tmp_path)
-    try:
-        zs = zonal_stats(
-            vectors=gdf,            # GeoDataFrame vagy iterable geometria
-            raster=tmp_path,
-            stats=["mean"],
-            nodata=None,
-            geojson_out=False,
-            all_touched=False,
-            raster_out=False
-        )
-        vals = [z["mean"] if z and ("mean" in z) else None for z in zs]
-        df = pd.DataFrame({key_col: gdf[key_col].values, da.name: vals})
-        return df
-    finally:
-        try:
-            os.remove(tmp_path)
-        except Exception:
-            pass
+def process_one_var(var_key: str, gdf: gpd.GeoDataFrame) -> pd.DataFrame:
+    """Egy változó: 0–30 cm súlyozott raszter + ország-átlagok (egy szálban fut)."""
+    da = load_weighted_0_30(var_key, gdf)
+    return zonal_means_bincount(da, gdf, "CNTR_CODE", da.name)
 
 
 def main():
@@ -154,23 +116,22 @@ def main():
             raise SystemExit(f"Hiányzik a bemeneti CSV: {csv}")
 
     # 1) Országpoligonok betöltése (ISO2 a CNTR_CODE oszlopban)
-    countries_path = ensure_countries_geojson(COUNTRIES_PATH, FALLBACK_NUTS_PATH)
-    gdf = gpd.read_file(countries_path).to_crs(4326)
+    gdf = ensure_countries_gdf(COUNTRIES_PATH, FALLBACK_NUTS_PATH, COUNTRIES_CACHE)
     if "CNTR_CODE" not in gdf.columns:
         raise SystemExit("A countries fájlban hiányzik a 'CNTR_CODE' oszlop (ISO2 országkód).")
 
     # 2) SoilGrids 0–30 cm súlyozott raszterek + zónastatisztikák
-    soil_tables: List[pd.DataFrame] = []
+    # a letöltés I/O-kötött: VAR_WORKERS változó megy párhuzamosan, a map megtartja a sorrendet
     print("Letöltés és zónastatisztika (0–30 cm) országonként...")
-    for var_key in tqdm(VARIABLES.keys()):
-        da = load_weighted_0_30(var_key)
-        tbl = country_zonal_mean(da, gdf, key_col="CNTR_CODE")
-        soil_tables.append(tbl)
+    # a dask ütemezőt egyszer, a fő szálban állítjuk be; a munkaszálak compute() hívásai ezt használják
+    with dask.config.set(scheduler="threads", num_workers=4), ThreadPoolExecutor(max_workers=VAR_WORKERS) as ex:
+        soil_tables: List[pd.DataFrame] = list(
+            tqdm(ex.map(lambda v: process_one_var(v, gdf), VARIABLES), total=len(VARIABLES))
+        )
 
     # 3) Ország-szintű talaj baseline tábla összeillesztése
-    soil_df = soil_tables[0]
-    for t in soil_tables[1:]:
-        soil_df = soil_df.merge(t, on="CNTR_CODE", how="outer")
+    #    (minden tábla ugyanabból a gdf-ből jön, azonos kulcssorrenddel -> egy oszlopirányú concat)
+    soil_df = pd.concat([t.set_index("CNTR_CODE") for t in soil_tables], axis=1).reset_index()
 
     # emberbarát oszlopnevek
     rename_map = {
@@ -185,6 +146,7 @@ def main():
     }
     soil_df = soil_df.rename(columns=rename_map).sort_values("CNTR_CODE")
     soil_df.to_csv(OUT_SOIL_COUNTRY, index=False, encoding="utf-8")
+    soil_df.to_parquet(os.path.splitext(OUT_SOIL_COUNTRY)[0] + ".parquet", compression="zstd", engine="pyarrow", index=False)
     print(f"Ország-szintű SoilGrids baseline mentve: {OUT_SOIL_COUNTRY}  ({soil_df.shape[0]} sor)")
 
     # 4) Ár-CSV-k betöltése és join (minden évhez ugyanaz a soil baseline kerül ország szerint)
@@ -201,6 +163,8 @@ def main():
 
         merged = merged.drop(columns=["CNTR_CODE"])
         merged.to_csv(out_csv, index=False, encoding="utf-8")
+        # oszlopos másolat a további join-okhoz (gyorsabb írás/olvasás, kisebb fájl)
+        merged.to_parquet(os.path.splitext(out_csv)[0] + ".parquet", compression="zstd", engine="pyarrow", index=False)
         print(f"Kiírva: {out_csv}  ({merged.shape[0]} sor, {merged.shape[1]} oszlop)")
 
     print("Kész ✅")
@@ -7,17 +7,21 @@ Kimenet: soilgrids_europe_0_5cm.csv  (CNTR_CODE + soil_* oszlopok)
 """
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List
 import pandas as pd
 import geopandas as gpd
-import xarray as xr
-import rioxarray as rxr
-from rasterstats import zonal_stats
+import shapely
 from tqdm import tqdm
 
+from soilgrids_common import (
+    VAR_WORKERS, apply_gdal_env, ensure_countries_gdf, open_soilgrids, zonal_means_bincount,
+)
+
 # ----- Fájlok -----
 COUNTRIES_PATH = "nuts0_countries.geojson"
 FALLBACK_NUTS_PATH = "NUTS_RG_60M_2024_4326.geojson"
+COUNTRIES_CACHE = "nuts0_countries.parquet"  # GeoParquet cache
 OUT_CSV = "soilgrids_europe_0_5cm.csv"
 
 # ----- Európa / EU kódok (ISO2) -----
@@ -44,25 +48,7 @@ VARIABLES: Dict[str, tuple] = {
 }
 DEPTH = "0-5cm"  # most csak ez kell
 
-def ensure_countries_geojson(countries_path: str, fallback_nuts_path: str) -> str:
-    """Ha nincs ország-GeoJSON, készít egyet a NUTS fájlból (LEVL_CODE=0)."""
-    if os.path.exists(countries_path):
-        print(f"Ország-GeoJSON megvan: {countries_path}")
-        return countries_path
-    if not os.path.exists(fallback_nuts_path):
-        raise SystemExit(
-            f"Hiányzik a {countries_path}, és a fallback NUTS fájl sem található: {fallback_nuts_path}"
-        )
-    print(f"{countries_path} nem található – előállítás {fallback_nuts_path} alapján (LEVL_CODE=0)...")
-    gdf = gpd.read_file(fallback_nuts_path)
-    if "LEVL_CODE" not in gdf.columns:
-        raise SystemExit("A NUTS forrásban nincs 'LEVL_CODE' oszlop.")
-    gdf0 = gdf[gdf["LEVL_CODE"] == 0].copy()
-    keep = [c for c in ["CNTR_CODE","NUTS_ID","NAME_LATN","NUTS_NAME","geometry"] if c in gdf0.columns]
-    gdf0 = gdf0[keep].to_crs(4326)
-    gdf0.to_file(countries_path, driver="GeoJSON")
-    print(f"Ország-GeoJSON előállítva: {countries_path} ({len(gdf0)} rekord)")
-    return countries_path
+apply_gdal_env()
 
 def raster_url(var_key: str) -> str:
     """VRT URL a 0–5 cm mean rétegre."""
@@ -73,44 +59,28 @@ def zonal_mean_1var(gdf: gpd.GeoDataFrame, var_key: str, key_col: str = "CNTR_CO
     """Betölti a VRT-et és országokra átlagol (0–5 cm). Egy sor / ország."""
     url = raster_url(var_key)
     try:
-        da = rxr.open_rasterio(url, masked=True).squeeze()
-        if not da.rio.crs:
-            da = da.rio.write_crs(4326)
+        # lusta megnyitás + vágás az európai országok bbox-ára: a globális VRT-ből csak ez az ablak töltődik be
+        da = open_soilgrids(url, gdf)
     except Exception as e:
         raise SystemExit(f"Hiba a raszter megnyitásakor: {url}\n{e}")
 
-    tmp = f"_tmp_{var_key}_{DEPTH}.tif"
-    da.rio.to_raster(tmp)
-    try:
-        zs = zonal_stats(
-            vectors=gdf,
-            raster=tmp,
-            stats=["mean"],
-            nodata=None,
-            geojson_out=False,
-            all_touched=False,
-            raster_out=False
-        )
-        colname = f"{var_key}_0_5cm"
-        vals = [z["mean"] if z and ("mean" in z) else None for z in zs]
-        return pd.DataFrame({key_col: gdf[key_col].values, colname: vals})
-    finally:
-        try:
-            os.remove(tmp)
-        except Exception:
-            pass
+    # a címkerasztert az első változó készíti el, a többi már a cache-ből kapja
+    return zonal_means_bincount(da, gdf, key_col, f"{var_key}_0_5cm")
 
 def main():
     # 1) Országok beolvasása / előállítása
-    countries_path = ensure_countries_geojson(COUNTRIES_PATH, FALLBACK_NUTS_PATH)
-    gdf = gpd.read_file(countries_path).to_crs(4326)
+    gdf = ensure_countries_gdf(COUNTRIES_PATH, FALLBACK_NUTS_PATH, COUNTRIES_CACHE)
     if "CNTR_CODE" not in gdf.columns:
         raise SystemExit("A countries fájlban hiányzik a 'CNTR_CODE' oszlop (ISO2).")
 
     # 2) EU/Európa szűrés és DISSOLVE -> 1 sor / ország
-    gdf = gdf[gdf["CNTR_CODE"].isin(KEEP_COUNTRIES)].copy()
-    gdf = gdf.dissolve(by="CNTR_CODE", as_index=False)  # <<< kritikus a duplikátumok ellen
-    gdf = gdf.to_crs(4326).sort_values("CNTR_CODE").reset_index(drop=True)
+    #    (csak a geometriát egyesítjük, közvetlen GEOS unary_union országonként)
+    gdf = gdf[gdf["CNTR_CODE"].isin(KEEP_COUNTRIES)]
+    geoms = gdf.groupby("CNTR_CODE")["geometry"].agg(lambda s: shapely.unary_union(s.to_numpy()))
+    gdf = gpd.GeoDataFrame({"CNTR_CODE": geoms.index}, geometry=list(geoms.values), crs=gdf.crs)  # <<< kritikus a duplikátumok ellen
+    if gdf.crs is None or gdf.crs.to_epsg() != 4326:
+        gdf = gdf.to_crs(4326)
+    gdf = gdf.sort_values("CNTR_CODE").reset_index(drop=True)
     if gdf.empty:
         raise SystemExit("A szűrés után nincs ország a GeoJSON-ban. Ellenőrizd a CNTR_CODE értékeket.")
 
@@ -118,17 +88,16 @@ def main():
     print("Downloading SoilGrids 0-5 cm layers and computing country-level means...")
 
     # 3) Változók zónastatisztikája (0–5 cm, 1 sor / ország)
-    tables: List[pd.DataFrame] = []
-    pbar = tqdm(list(VARIABLES.keys()), desc="Soil variable")
-    for var_key in pbar:
-        pbar.set_postfix_str(f"{var_key} (0-5cm)")
-        tbl = zonal_mean_1var(gdf, var_key, key_col="CNTR_CODE")
-        tables.append(tbl)
-
-    # 4) Összeolvasztás biztonságosan (LEFT merge egy alaptáblára)
-    soil_df = gdf[["CNTR_CODE"]].drop_duplicates().copy()
-    for t in tables:
-        soil_df = soil_df.merge(t, on="CNTR_CODE", how="left")
+    #    a letöltés I/O-kötött: VAR_WORKERS változó megy párhuzamosan, a map megtartja a sorrendet
+    with ThreadPoolExecutor(max_workers=VAR_WORKERS) as ex:
+        tables: List[pd.DataFrame] = list(tqdm(
+            ex.map(lambda v: zonal_mean_1var(gdf, v, key_col="CNTR_CODE"), VARIABLES),
+            total=len(VARIABLES),
+            desc="Soil variable",
+        ))
+
+    # 4) Összeolvasztás: minden tábla ugyanabból a (már egyedi kulcsú) gdf-ből jön -> egy oszlopirányú concat
+    soil_df = pd.concat([t.set_index("CNTR_CODE") for t in tables], axis=1).reset_index()
 
     # 5) Barátságos oszlopnevek
     rename_map = {
@@ -144,6 +113,8 @@ def main():
     soil_df = soil_df.rename(columns=rename_map).sort_values("CNTR_CODE")
 
     soil_df.to_csv(OUT_CSV, index=False, encoding="utf-8")
+    # oszlopos másolat a további join-okhoz (gyorsabb írás/olvasás, kisebb fájl)
+    soil_df.to_parquet(os.path.splitext(OUT_CSV)[0] + ".parquet", compression="zstd", engine="pyarrow", index=False)
     print(f"Kész: {OUT_CSV}  ({soil_df.shape[0]} sor, {soil_df.shape[1]} oszlop)")
 
 if __name__ == "__main__":
@@ -1,7 +1,6 @@
-import pandas as pd
-
-# 1. Töltsd le a Berkeley Earth fájlt (GlobalLandTemperaturesByCountry.csv)
-df = pd.read_csv("GlobalLandTemperaturesByCountry.csv")
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
 
 # 2. Szűrés: csak az általad kívánt országok (angol nevekkel) és dátum 2000–2024 közé
 iso_map = {
@@ -14,18 +13,40 @@ iso_map = {
     "Sweden":"SE", "Slovenia":"SI", "Slovakia":"SK", "United Kingdom":"UK"
 }
 
-# konvertáljuk dátum évre
-df['dt'] = pd.to_datetime(df['dt'])
-df['year'] = df['dt'].dt.year
-
-# Leválogatás 2000 ≤ year ≤ 2024, és abban az országokban, amik benne vannak
-df2 = df[df['year'].between(2000, 2024) & df['Country'].isin(iso_map.keys())]
-
-# Átlag évre: grup összes hónapból
-df_yr = df2.groupby(['year','Country'])['AverageTemperature'].mean().reset_index()
-
-# Add hozzá az iso-kód oszlopot
-df_yr['cntry_code'] = df_yr['Country'].map(iso_map)
+# 1. Töltsd le a Berkeley Earth fájlt (GlobalLandTemperaturesByCountry.csv)
+#    pyarrow többszálú CSV olvasó, csak a szükséges oszlopok; Country szótárkódolva
+tbl = pv.read_csv(
+    "GlobalLandTemperaturesByCountry.csv",
+    convert_options=pv.ConvertOptions(
+        include_columns=['dt', 'Country', 'AverageTemperature'],
+        column_types={'dt': pa.string(), 'Country': pa.dictionary(pa.int32(), pa.string())},
+    ),
+)
+
+# év a dátum első 4 karakteréből (ISO 'YYYY-MM-DD'), teljes dátumparszolás nélkül
+year = pc.cast(pc.utf8_slice_codeunits(tbl['dt'], 0, 4), pa.int16())
+tbl = tbl.append_column('year', year)
+
+# Leválogatás 2000 ≤ year ≤ 2024, és abban az országokban, amik benne vannak (még Arrow-ban)
+mask = pc.and_(
+    pc.is_in(tbl['Country'], value_set=pa.array(list(iso_map))),
+    pc.and_(pc.greater_equal(year, 2000), pc.less_equal(year, 2024)),
+)
+# a többszálú olvasás darabonként saját szótárat ad a Country oszlopnak -> egységesítjük a group_by előtt
+tbl = tbl.filter(mask).unify_dictionaries()
+
+# Átlag évre: grup összes hónapból (Arrow group_by, utána pandas)
+df_yr = (
+    tbl.group_by(['year', 'Country'])
+    .aggregate([('AverageTemperature', 'mean')])
+    .to_pandas()
+    .rename(columns={'AverageTemperature_mean': 'AverageTemperature'})
+    .astype({'Country': 'category'})
+    .sort_values(['year', 'Country'], ignore_index=True)
+)
+
+# Add hozzá az iso-kód oszlopot (csak a kategóriákat nevezzük át, nem soronként képezünk le)
+df_yr['cntry_code'] = df_yr['Country'].cat.rename_categories(iso_map)
 
 # Válaszd ki az oszlopokat ebben a sorrendben
 df_out = df_yr[['year','cntry_code','AverageTemperature']].rename(columns={'AverageTemperature':'avg_temp_c'})
@@ -1,17 +1,35 @@
 # py -3.13 test_era5land.py
+from concurrent.futures import ThreadPoolExecutor
+
 import cdsapi
+
+DATASET = "reanalysis-era5-land-monthly-means"
+YEAR = "2000"
+MONTHS = ["01"]  # add more months here; each one is submitted as its own CDS request
+
 c = cdsapi.Client()
 print("Connected to:", c.url)
-c.retrieve(
-    "reanalysis-era5-land-monthly-means",
-    {
-        "product_type": "monthly_averaged_reanalysis",
-        "variable": ["volumetric_soil_water_layer_1"],
-        "year": "2000",
-        "month": ["01"],
-        "time": "00:00",
-        "format": "netcdf",
-    },
-    "era5land_test_2000_01.nc",
-)
-print("OK: era5land_test_2000_01.nc downloaded")
+
+
+def fetch_month(month: str) -> str:
+    # retrieve() without a target only waits for the CDS job; the download is a separate step,
+    # so several months queue on the CDS side at the same time
+    target = f"era5land_test_{YEAR}_{month}.nc"
+    r = c.retrieve(
+        DATASET,
+        {
+            "product_type": "monthly_averaged_reanalysis",
+            "variable": ["volumetric_soil_water_layer_1"],
+            "year": YEAR,
+            "month": [month],
+            "time": "00:00",
+            "format": "netcdf",
+        },
+    )
+    r.download(target)
+    return target
+
+
+with ThreadPoolExecutor(max_workers=min(8, len(MONTHS))) as ex:
+    for target in ex.map(fetch_month, MONTHS):
+        print(f"OK: {target} downloaded")